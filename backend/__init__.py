@@ -7,3 +7,5 @@ class GLOBALS:
 from . import settings
 from . import processing
 from . import pubsub
+from . import export
+from . import store
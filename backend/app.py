@@ -92,7 +92,11 @@ class App(flask.Flask):
         @self.route('/settings', methods=['GET', 'POST'])
         def get_set_settings():
             if flask.request.method=='POST':
-                self.settings.set_settings(flask.request.get_json(force=True))
+                try:
+                    self.settings.set_settings(flask.request.get_json(force=True))
+                except ValueError as e:
+                    print(f'[ERROR] {e}', file=sys.stderr)
+                    flask.abort(400, str(e))
                 return 'OK'
             elif flask.request.method=='GET':
                 return flask.jsonify(self.settings.get_settings_as_dict())
@@ -119,6 +123,10 @@ class App(flask.Flask):
             return 'OK'
         
         self.route('/process_image/<imagename>')(self.process_image)
+        self.route('/process_images', methods=['POST'])(self.process_images)
+        self.route('/export_results', methods=['GET', 'POST'])(self.export_results)
+        self.route('/results/label_counts')(self.results_label_counts)
+        self.route('/results/images')(self.results_images)
         self.route('/training', methods=['POST'])(self.training)
         self.route('/save_model')(self.save_model)
         self.route('/stop_training')(self.stop_training)
@@ -151,9 +159,95 @@ class App(flask.Flask):
         if not os.path.exists(full_path):
             flask.abort(404)
                 
-        result = backend.processing.process_image(full_path, self.settings)
+        result = self.process_and_save_result(full_path)
         return flask.jsonify(result)
     
+    def process_and_save_result(self, full_path:str) -> dict:
+        '''Process a cached image and keep the result in the cache for exporting'''
+        result = backend.processing.process_image(full_path, self.settings)
+        backend.export.save_result(result, full_path, self.cache_path)
+        return result
+    
+    def get_requested_imagenames(self) -> tp.List[str]:
+        '''Image names from the json body or query string, "all" for all cached images'''
+        data       = flask.request.get_json(force=True, silent=True) or {}
+        imagenames = data.get('imagenames', flask.request.args.get('imagenames', 'all'))
+        if imagenames == 'all':
+            imagenames = sorted(
+                f for f in os.listdir(self.cache_path) if not backend.export.is_output_file(f)
+            )
+        elif isinstance(imagenames, str):
+            imagenames = [imagenames]
+        elif not isinstance(imagenames, list) or not all(isinstance(n, str) for n in imagenames):
+            flask.abort(400, 'imagenames must be a list of strings or "all"')
+        return [os.path.basename(n) for n in imagenames]
+
+    def process_images(self):
+        '''Process multiple images and stream back the results as newline-delimited json'''
+        imagenames = self.get_requested_imagenames()
+        imagefiles = [get_cache_path(n) for n in imagenames]
+
+        def generator():
+            for imagename, imagefile in zip(imagenames, imagefiles):
+                if not os.path.exists(imagefile):
+                    yield json.dumps({'imagename':imagename, 'error':'File not found'})+'\n'
+                    continue
+                try:
+                    result = self.process_and_save_result(imagefile)
+                    line   = {'imagename':imagename, 'result':result}
+                except Exception as e:
+                    print(f'[ERROR] {imagename}: {e}', file=sys.stderr)
+                    line   = {'imagename':imagename, 'error':str(e)}
+                yield json.dumps(line)+'\n'
+        return flask.Response(generator(), mimetype='application/x-ndjson')
+
+    def export_results(self):
+        '''Stream a zip archive with all classmaps and a csv file of processed images'''
+        imagenames = self.get_requested_imagenames()
+
+        def processed():
+            for imagename in imagenames:
+                result = backend.export.load_result(imagename, self.cache_path)
+                if result is not None:
+                    yield imagename, result
+
+        def files():
+            #csv is collected while adding the classmaps, each result is loaded once
+            csvfile = tempfile.SpooledTemporaryFile(max_size=16*1024*1024, mode='w+', newline='')
+            for text in backend.export.results_to_csv([], header=True):
+                csvfile.write(text)
+            for imagename, result in processed():
+                for text in backend.export.results_to_csv([(imagename, result)], header=False):
+                    csvfile.write(text)
+                classmap = result.get('classmap')
+                if classmap and os.path.exists(get_cache_path(classmap)):
+                    yield classmap, get_cache_path(classmap)
+            csvfile.seek(0)
+            yield 'results.csv', iter(lambda: csvfile.read(backend.export.CHUNKSIZE), '')
+
+        return flask.Response(
+            backend.export.stream_zip(files()),
+            mimetype = 'application/zip',
+            headers  = {'Content-Disposition': 'attachment; filename=results.zip'},
+        )
+    
+    def results_label_counts(self):
+        '''Number of detections per label in all results processed so far'''
+        model = flask.request.args.get('model', None)
+        return flask.jsonify(backend.processing.get_result_store().count_labels(model))
+
+    def results_images(self):
+        '''Processed images filtered by label and/or box area, paginated'''
+        args = flask.request.args
+        return flask.jsonify(backend.processing.get_result_store().find_images(
+            label    = args.get('label',    None),
+            min_area = args.get('min_area', None, type=float),
+            max_area = args.get('max_area', None, type=float),
+            model    = args.get('model',    None),
+            limit    = args.get('limit',    100,  type=int),
+            offset   = args.get('offset',   0,    type=int),
+        ))
+    
     def training(self):
         imagefiles = dict(flask.request.form.lists())['filenames[]']
         imagefiles = [get_cache_path(fname) for fname in imagefiles]
@@ -1,9 +1,35 @@
-import argparse, pathlib, glob, os, sys
+import argparse, pathlib, glob, os, sys, re, csv, time
 
 import backend.settings
 
 
 
+def parse_shard(s:str) -> tuple:
+    '''Parse a shard specification "i/N" into (i, N) with 0 <= i < N'''
+    match = re.fullmatch(r'(\d+)/(\d+)', s.strip())
+    if not match or not (0 <= int(match.group(1)) < int(match.group(2))):
+        raise argparse.ArgumentTypeError(f'Invalid shard "{s}", expected i/N with 0 <= i < N')
+    return int(match.group(1)), int(match.group(2))
+
+def select_shard(inputfiles:list, i:int, n:int) -> list:
+    '''Deterministic contiguous partitioning, shards concatenated in order of i
+       yield the original order'''
+    return inputfiles[ i*len(inputfiles)//n : (i+1)*len(inputfiles)//n ]
+
+def shard_output_path(output:pathlib.Path, i:int, n:int) -> pathlib.Path:
+    return output.with_name(f'{output.stem}.shard-{i}-of-{n}{output.suffix}')
+
+def find_shard_outputs(output:pathlib.Path) -> list:
+    '''All shard outputs belonging to `output`, sorted by shard index'''
+    pattern = re.compile(re.escape(output.stem)+r'\.shard-(\d+)-of-(\d+)'+re.escape(output.suffix))
+    shards  = []
+    for f in glob.glob(glob.escape(output.parent.as_posix())+'/*'):
+        match = pattern.fullmatch(os.path.basename(f))
+        if match:
+            shards += [(int(match.group(1)), int(match.group(2)), pathlib.Path(f))]
+    return sorted(shards)
+
+
 class CLI:
     '''Command line interface'''
 
@@ -22,31 +48,101 @@ class CLI:
                             help=f'Path to output file (e.g. --output={default_output})')
         parser.add_argument('--model',  type=pathlib.Path,
                             help='Path to model file (default: last used)')
+        parser.add_argument('--profile', type=str, default=None,
+                            choices=list(backend.settings.INFERENCE_PROFILES),
+                            help='Speed/accuracy trade-off for inference (default: last used)')
+        parser.add_argument('--boxes-only', action='store_true',
+                            help='Skip masks and classmaps, output only boxes (faster)')
+        parser.add_argument('--watch',  action='store_true',
+                            help='Keep running and process new or modified input files '
+                                 'as soon as they are written, appending to the output file')
+        parser.add_argument('--shard',  type=parse_shard, default=None,
+                            help='Process only the i-th of N parts of the input files '
+                                 'and write them to a separate output file (e.g. --shard=0/4)')
+        parser.add_argument('--store',  type=pathlib.Path, default=None,
+                            help='Database file in which all results are stored for querying, '
+                                 'must be on a local disk (default: results.sqlite in the '
+                                 'instance folder, disabled when using --shard)')
+        parser.add_argument('--no-store', action='store_true',
+                            help='Do not store results in the database')
+        
+        subparsers = parser.add_subparsers(dest='command')
+        merge      = subparsers.add_parser('merge', 
+            help = 'Combine the outputs of all shards into the final output file'
+        )
+        merge.add_argument('--output', type=pathlib.Path, default=argparse.SUPPRESS,
+                            help=f'Path to the final output file (e.g. --output={default_output})')
+        
+        query = subparsers.add_parser('query',
+            help = 'Query the results of all images processed so far'
+        )
+        query.add_argument('what', choices=['counts', 'images'],
+                            help='Number of detections per label or list of images')
+        query.add_argument('--label',    type=str,   default=None,
+                            help='Only images with at least one detection of this label')
+        query.add_argument('--min-area', type=float, default=None,
+                            help='Only images with at least one box of this size or larger')
+        query.add_argument('--max-area', type=float, default=None,
+                            help='Only images with at least one box of this size or smaller')
+        query.add_argument('--modelname', type=str,  default=None,
+                            help='Only results of this model')
+        query.add_argument('--store',    type=pathlib.Path, default=argparse.SUPPRESS,
+                            help='Database file to query (default: results.sqlite in the instance folder)')
+        query.add_argument('--limit',    type=int,   default=100)
+        query.add_argument('--offset',   type=int,   default=0)
         return parser
 
     @classmethod
-    def process_cli_args(cls, args):
-        inputfiles = sorted(glob.glob(args.input.as_posix(), recursive=True))
-        if len(inputfiles) == 0:
-            print('Could not find any files')
-            return
-        
+    def configure_result_store(cls, args):
+        import backend.processing
+        #shards running on multiple nodes must not write into the same database
+        enabled = not args.no_store and (args.store is not None or not args.shard)
+        path    = args.store.as_posix() if args.store else None
+        backend.processing.configure_result_store(enabled, path)
+
+    @classmethod
+    def load_settings(cls, args):
         import backend.settings
+        cls.configure_result_store(args)
         settings = backend.settings.Settings()
 
         if args.model:
-            #TODO: code duplication
             modelpath = args.model.as_posix()
             if not os.path.exists(modelpath):
                 print(f'[ERROR] File "{modelpath}" does not exist')
-                return 1
+                return None
             model = settings.load_modelfile(modelpath)
             settings.models['detection'] = model
+            settings.active_models['detection'] = settings.get_modelname(modelpath)
+        if args.profile:
+            settings.inference_profile = args.profile
+        if args.boxes_only:
+            settings.boxes_only = True
+        settings.apply_inference_profile()
+        return settings
+
+    @classmethod
+    def process_cli_args(cls, args):
+        inputfiles = sorted(glob.glob(args.input.as_posix(), recursive=True))
+        if len(inputfiles) == 0:
+            print('Could not find any files')
+            return
         
+        if args.shard:
+            inputfiles  = select_shard(inputfiles, *args.shard)
+            args.output = shard_output_path(args.output, *args.shard)
+            print(f'Shard {args.shard[0]} of {args.shard[1]}')
+        
+        settings = cls.load_settings(args)
+        if settings is None:
+            return 1
 
         import backend.processing  #FIXME
         print(f'Processing {len(inputfiles)} files')
-        results = []
+        #write each result as soon as it is done, to not lose work on a crash
+        #(empty shards also need an output file for merging)
+        cls.write_results([], args)
+        n_ok = 0
         for i,f in enumerate(inputfiles):
             print(f'[{i:4d} / {len(inputfiles)}] {f}')
             try:
@@ -54,28 +150,138 @@ class CLI:
             except Exception as e:
                 print(f'[ERROR] {e}', file=sys.stderr)
                 continue
-            results += [{'filename':f, 'result':result}]
+            cls.append_results([{'filename':f, 'result':result}], args)
+            n_ok += 1
         
-        if len(results)==0:
+        if n_ok==0 and not args.shard:
             print(f'[ERROR] Unable to process any file', file=sys.stderr)
             return
         
-        cls.write_results(results, args)
         print(f'Results written to {args.output.as_posix()}.')
 
     @classmethod
-    def write_results(cls, results:list, args):
-        print('[NOT IMPLEMENTED] output to file be implemented downstream')
-        #outputfile = open(filename, 'w')
-        #outputfile.write(results_to_csv(results, args.saveboxes))
+    def watch_cli_args(cls, args):
+        import backend.watch
+        watcher = backend.watch.FolderWatcher(args.input.as_posix())
+        #continue where a previous run stopped
+        watcher.mark_as_seen(cls.read_processed_files(args))
+
+        settings = cls.load_settings(args)
+        if settings is None:
+            return 1
+
+        import backend.processing
+        print(f'Watching {args.input.as_posix()} (press Ctrl+C to stop)')
+        try:
+            for inputfiles in watcher:
+                for f in inputfiles:
+                    print(f'[{time.strftime("%H:%M:%S")}] {f}')
+                    try:
+                        result = backend.processing.process_image(f, settings)
+                    except Exception as e:
+                        print(f'[ERROR] {e}', file=sys.stderr)
+                        continue
+                    cls.append_results([{'filename':f, 'result':result}], args)
+        except KeyboardInterrupt:
+            print(f'Results written to {args.output.as_posix()}.')
+
+    @classmethod
+    def write_results(cls, results:list, args, mode='w'):
+        '''Write results to args.output as csv.
+           If overridden, read_processed_files() must be overridden as well.'''
+        import backend.export
+        header = (mode == 'w' or not os.path.exists(args.output) or os.path.getsize(args.output) == 0)
+        with open(args.output, mode, newline='') as outputfile:
+            for chunk in backend.export.results_to_csv(
+                ((r['filename'], r['result']) for r in results), header=header
+            ):
+                outputfile.write(chunk)
+    
+    @classmethod
+    def append_results(cls, results:list, args):
+        cls.write_results(results, args, mode='a')
+    
+    @classmethod
+    def read_processed_files(cls, args) -> set:
+        '''Input files that are already contained in the output file.
+           Counterpart of write_results(), must parse the same format.'''
+        if not os.path.exists(args.output):
+            return set()
+        with open(args.output, newline='') as f:
+            rows = csv.reader(f)
+            next(rows, None)  #header
+            return set(row[0] for row in rows if len(row))
+    
+    @classmethod
+    def query_cli_args(cls, args):
+        import backend.store
+        store = backend.store.ResultStore(args.store.as_posix() if args.store else None)
+        if args.what == 'counts':
+            for label, n in store.count_labels(args.modelname).items():
+                print(f'{label}: {n}')
+        else:
+            found = store.find_images(
+                label    = args.label,
+                min_area = args.min_area,
+                max_area = args.max_area,
+                model    = args.modelname,
+                limit    = args.limit,
+                offset   = args.offset,
+            )
+            for image in found['images']:
+                print(f'{image["filename"]}  ({image["n_detections"]} detections, model: {image["model"]})')
+            print(f'[{args.offset} - {args.offset+len(found["images"])} of {found["total"]}]')
+
+    @classmethod
+    def merge_cli_args(cls, args):
+        shards = find_shard_outputs(args.output)
+        if len(shards) == 0:
+            print(f'[ERROR] No shard outputs found for {args.output.as_posix()}', file=sys.stderr)
+            return 1
         
+        n = shards[0][1]
+        if [(i,_n) for i,_n,_ in shards] != [(i,n) for i in range(n)]:
+            print(f'[ERROR] Incomplete or inconsistent shards: '
+                  f'{[f.name for _,_,f in shards]}', file=sys.stderr)
+            return 1
+        
+        shardfiles = [f for _,_,f in shards]
+        cls.merge_results(shardfiles, args)
+        print(f'Merged {n} shards into {args.output.as_posix()}.')
+
+    @classmethod
+    def merge_results(cls, shardfiles:list, args):
+        '''Concatenate the shard outputs, keeping the header line only once'''
+        header = None
+        with open(args.output, 'w', newline='') as outputfile:
+            for shardfile in shardfiles:
+                with open(shardfile, newline='') as f:
+                    first = f.readline()
+                    if header is None:
+                        header = first
+                        outputfile.write(first)
+                    elif first != header:
+                        outputfile.write(first)
+                    for line in f:
+                        outputfile.write(line)
 
     @classmethod
     def run(cls):
         args = cls.create_parser().parse_args()
-        if args.input:
+        if args.command == 'merge':
+            cls.merge_cli_args(args)
+            return True
+        elif args.command == 'query':
+            cls.query_cli_args(args)
+            return True
+        elif args.input and args.watch:
+            if args.shard:
+                print('[ERROR] --watch cannot be combined with --shard', file=sys.stderr)
+                return True
+            cls.watch_cli_args(args)
+            return True
+        elif args.input:
             cls.process_cli_args(args)
             return True
         else:
             return False
-
@@ -0,0 +1,104 @@
+import os, io, csv, json, zipfile
+import typing as tp
+
+
+RESULT_SUFFIX   = '.result.json'
+CLASSMAP_SUFFIX = '.segmentation.png'
+CSV_HEADER      = ['filename', 'label', 'x0', 'y0', 'x1', 'y1']
+CHUNKSIZE       = 1024*1024
+
+
+def result_path(imagepath:str, outputdir:str) -> str:
+    '''Path to the json file that stores the processing result of an image'''
+    return os.path.join(outputdir, os.path.basename(imagepath)+RESULT_SUFFIX)
+
+def save_result(result:dict, imagepath:str, outputdir:str) -> str:
+    path = result_path(imagepath, outputdir)
+    json.dump(result, open(path, 'w'))
+    return path
+
+def load_result(imagepath:str, outputdir:str) -> tp.Optional[dict]:
+    path = result_path(imagepath, outputdir)
+    if not os.path.exists(path):
+        return None
+    return json.load(open(path))
+
+def is_output_file(filename:str) -> bool:
+    '''Whether a file in the cache was generated during processing'''
+    return filename.endswith(RESULT_SUFFIX) or filename.endswith(CLASSMAP_SUFFIX)
+
+
+def result_to_csv_rows(filename:str, result:dict) -> tp.List[list]:
+    if len(result['labels']) == 0:
+        #keep images without detections in the output
+        return [[filename] + ['']*(len(CSV_HEADER)-1)]
+    rows = []
+    for label, box in zip(result['labels'], result['boxes']):
+        rows += [[filename, label] + [f'{x:.1f}' for x in box]]
+    return rows
+
+def results_to_csv(results:tp.Iterable[tp.Tuple[str, dict]], header=True) -> tp.Iterator[str]:
+    '''Format (filename, result) pairs as csv, one chunk of text per image'''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_HEADER)
+    for filename, result in results:
+        writer.writerows(result_to_csv_rows(filename, result))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _StreamBuffer:
+    '''Write-only, non-seekable file object that collects data until popped'''
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data:bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def stream_zip(
+    files:tp.Iterable[tp.Tuple[str, tp.Union[str, tp.Iterable[str]]]]
+) -> tp.Iterator[bytes]:
+    '''Build a zip archive on the fly and yield it in chunks.
+       `files` contains (arcname, source) pairs where source is either a path
+       to a file on disk or an iterable of text chunks.
+       Nothing is staged on disk and only one chunk is held in memory.'''
+    return (chunk for chunk in _stream_zip(files) if chunk)
+
+def _stream_zip(files) -> tp.Iterator[bytes]:
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for arcname, source in files:
+            if isinstance(source, str):
+                #images are already compressed
+                info = zipfile.ZipInfo.from_file(source, arcname)
+                info.compress_type = zipfile.ZIP_STORED
+                with open(source, 'rb') as f, archive.open(info, 'w') as z:
+                    while True:
+                        data = f.read(CHUNKSIZE)
+                        if not data:
+                            break
+                        z.write(data)
+                        yield buffer.pop()
+            else:
+                info = zipfile.ZipInfo(arcname)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, 'w') as z:
+                    for text in source:
+                        z.write(text.encode('utf8'))
+                        yield buffer.pop()
+            yield buffer.pop()
+    yield buffer.pop()
@@ -24,6 +24,10 @@ def get_models_path():
     #stores pretrained models
     return os.path.join( get_instance_path(), 'models' )
 
+def get_results_db_path():
+    #persistent database of processing results
+    return os.path.join( get_instance_path(), 'results.sqlite' )
+
 def get_frontend_folders():
     return [
         os.path.join(path_to_this_module(), '..', 'frontend'),       #base
@@ -1,7 +1,10 @@
 from . import GLOBALS
 from .app import get_cache_path
+from . import export
+from . import store
 
-import os
+import os, sys, sqlite3
+import typing as tp
 import PIL.Image
 
 def process_image(imagepath, settings):
@@ -9,16 +12,47 @@ def process_image(imagepath, settings):
         model    = settings.models['detection']
         result   = model.process_image(imagepath)
     
-    output_filename = os.path.basename(imagepath)+'.segmentation.png'
-    output_path     = os.path.join(
-        get_cache_path(), output_filename
-    )
+    output_filename = None
     classmap = result['classmap']
-    PIL.Image.fromarray( classmap ).save(output_path)
+    #boxes-only inference does not produce a classmap
+    if classmap is not None:
+        output_filename = os.path.basename(imagepath)+export.CLASSMAP_SUFFIX
+        output_path     = os.path.join(
+            get_cache_path(), output_filename
+        )
+        PIL.Image.fromarray( classmap ).save(output_path)
     labels   = [str(l) for l in result['labels']]
-    return {
+    result   = {
         'segmentation' : output_filename,
         'classmap'     : output_filename,
         'boxes'        : result['boxes'].tolist(),
         'labels'       : labels,
     }
+    modelname = settings.active_models.get('detection')
+    #unsaved models (e.g. after training) have no name yet
+    if modelname and _store_results:
+        #images in the cache by name, others by path as passed e.g. via the cli
+        in_cache = os.path.dirname(os.path.abspath(imagepath)) == os.path.abspath(get_cache_path())
+        filename = os.path.basename(imagepath) if in_cache else imagepath
+        try:
+            get_result_store().add(imagepath, modelname, result, filename=filename)
+        except (sqlite3.Error, OSError) as e:
+            print(f'[ERROR] Could not store result: {e}', file=sys.stderr)
+    return result
+
+
+_result_store      = None
+_result_store_path = None   #default location
+_store_results     = True
+
+def configure_result_store(enabled:bool = True, path:tp.Optional[str] = None) -> None:
+    '''Enable or disable storing results and set the database file.
+       The database must be on a local disk, not on a network filesystem.'''
+    global _result_store, _result_store_path, _store_results
+    _result_store, _result_store_path, _store_results = None, path, enabled
+
+def get_result_store() -> store.ResultStore:
+    global _result_store
+    if _result_store is None:
+        _result_store = store.ResultStore(_result_store_path)
+    return _result_store
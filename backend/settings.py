@@ -3,6 +3,15 @@ from . import app
 
 import torch
 
+#speed/accuracy trade-offs for inference, applied to models that support it
+INFERENCE_PROFILES = {
+    'fast':     dict(min_size=512,  max_size=853,  score_thresh=0.5, max_detections=50),
+    'balanced': dict(min_size=800,  max_size=1333, score_thresh=0.5, max_detections=100),
+    'accurate': dict(min_size=1024, max_size=1707, score_thresh=0.3, max_detections=300),
+}
+
+MODEL_FILE_ENDINGS = ['.pt.zip', '.pt', '.pkl']       #TODO: remove pkl files
+
 class Settings:
     FILENAME = 'settings.json'   #FIXME: hardcoded
 
@@ -17,12 +26,15 @@ class Settings:
         first_or_none    = lambda x: x[0] if len(x) else None
         return dict( active_models = dict([
             (modeltype, first_or_none(models)) for modeltype, models in available_models.items()
-        ] ) )
+        ] ), inference_profile = 'balanced', boxes_only = False )
 
     def load_settings_from_file(self):
         s = self.get_defaults()
         if os.path.exists(self.FILENAME):
             s.update(json.load(open(self.FILENAME)))
+            if s.get('inference_profile') not in INFERENCE_PROFILES:
+                print(f'[WARNING] Unknown inference profile "{s.get("inference_profile")}"')
+                s['inference_profile'] = self.get_defaults()['inference_profile']
             #self.set_settings(s)
         else:
             print(f'[WARNING] Settings file {self.FILENAME} not found.')
@@ -31,25 +43,41 @@ class Settings:
 
     def set_settings(self, s, save=True):
         print('Settings: ', s)
+        profile = s.get('inference_profile', None)
+        if profile is not None and profile not in INFERENCE_PROFILES:
+            raise ValueError(f'Unknown inference profile "{profile}"')
         for modeltype, modelname in s.get('active_models', {}).items():
             if self.active_models.get(modeltype, None) != modelname:
                 self.models[modeltype] = self.load_model(modeltype, modelname)
         self.__dict__.update( copy.deepcopy(s) )
+        self.apply_inference_profile()
 
         if save:
             previous_s = self.load_settings_from_file()
+            for k,v in previous_s.items():
+                s.setdefault(k, v)
             for modeltype, modelname in s['active_models'].items():
                 if modelname == '':  #unsaved
                     s['active_models'][modeltype] = previous_s['active_models'].get(modeltype)
             json.dump( s, open('settings.json','w'), indent=2) 
 
+    def apply_inference_profile(self):
+        profile    = INFERENCE_PROFILES[getattr(self, 'inference_profile', 'balanced')]
+        #skips masks and classmaps, not supported by segmentation-only UIs
+        boxes_only = bool(getattr(self, 'boxes_only', False))
+        for model in self.models.values():
+            #older models do not support this
+            if hasattr(model, 'set_inference_options'):
+                model.set_inference_options(**profile, boxes_only=boxes_only)
+
     def get_settings_as_dict(self):
         #s = self.load_settings_from_file()
         s = self.get_defaults()
         s = dict([ (k,getattr(self,k,v)) for k,v in s.items() ])
         return {
-            'settings'         : s,
-            'available_models' : self.get_available_models(with_properties=True)
+            'settings'           : s,
+            'available_models'   : self.get_available_models(with_properties=True),
+            'inference_profiles' : INFERENCE_PROFILES,
         }
 
     @classmethod
@@ -60,10 +88,10 @@ class Settings:
         models     = dict()
         for modeltype in modeltypes:
             modelfiles, modelnames = [], []
-            for ending in ['.pt.zip', '.pt', '.pkl']:       #TODO: remove pkl files
+            for ending in MODEL_FILE_ENDINGS:
                 _modelfiles = glob.glob(os.path.join(modelsdir, modeltype, '*'+ending))
                 modelfiles += _modelfiles
-                modelnames += [os.path.basename(m)[:-len(ending)] for m in _modelfiles]
+                modelnames += [cls.get_modelname(m) for m in _modelfiles]
 
             if with_properties:
                 modelprops        = [cls.get_model_properties(m) for m in modelfiles]
@@ -72,13 +100,21 @@ class Settings:
                 models[modeltype] = modelnames
         return models
 
+    @staticmethod
+    def get_modelname(modelfile:str) -> str:
+        '''Model name as listed in the available models, i.e. file name without ending'''
+        name = os.path.basename(modelfile)
+        for ending in MODEL_FILE_ENDINGS:
+            if name.endswith(ending):
+                return name[:-len(ending)]
+        return name
+
     @classmethod
     def load_model(cls, modeltype, modelname):
         import pickle
         print(f'Loading model {modeltype}/{modelname}')
         models_dir = app.get_models_path()
-        endings    = ['.pt.zip', '.pt', '.pkl']
-        for ending in endings:
+        for ending in MODEL_FILE_ENDINGS:
             path  = os.path.join(models_dir, modeltype, f'{modelname}{ending}')
             if os.path.exists(path):
                 return cls.load_modelfile(path)
@@ -0,0 +1,133 @@
+import sqlite3, hashlib, time, threading
+import typing as tp
+
+from .paths import get_results_db_path
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS images (
+    image_hash  TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    filename    TEXT NOT NULL,
+    classmap    TEXT,
+    processed   REAL NOT NULL,
+    PRIMARY KEY (image_hash, model)
+);
+CREATE INDEX IF NOT EXISTS images_filename ON images (filename);
+CREATE INDEX IF NOT EXISTS images_model    ON images (model, filename);
+
+CREATE TABLE IF NOT EXISTS detections (
+    id          INTEGER PRIMARY KEY,
+    image_hash  TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    label       TEXT NOT NULL,
+    x0 REAL, y0 REAL, x1 REAL, y1 REAL,
+    area        REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detections_image      ON detections (image_hash, model);
+CREATE INDEX IF NOT EXISTS detections_label_area ON detections (label, area);
+CREATE INDEX IF NOT EXISTS detections_area       ON detections (area);
+CREATE INDEX IF NOT EXISTS detections_model      ON detections (model, label);
+'''
+
+
+def hash_file(path:str, chunksize:int = 1024*1024) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunksize), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ResultStore:
+    '''Persistent, indexed storage of processing results, keyed by image hash and model.
+       Uses SQLite in WAL mode, the database file must be on a local disk.
+       The stored filename is the image name for images in the cache and the
+       path as given otherwise. The classmap refers to a file in the cache and
+       is only valid until the cache is cleared.'''
+
+    def __init__(self, path:tp.Optional[str] = None):
+        self.path = path or get_results_db_path()
+        #single connection, shared between the threads of the flask server
+        self.lock = threading.Lock()
+        self.db   = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+
+    def add(
+        self,
+        imagepath:  str,
+        model:      str,
+        result:     dict,
+        filename:   tp.Optional[str] = None,
+        image_hash: tp.Optional[str] = None,
+    ) -> str:
+        image_hash = image_hash or hash_file(imagepath)
+        filename   = filename or imagepath
+        rows = [
+            (image_hash, model, label, x0, y0, x1, y1, abs(x1-x0)*abs(y1-y0))
+            for label, (x0,y0,x1,y1) in zip(result['labels'], result['boxes'])
+        ]
+        with self.lock, self.db as db:
+            db.execute(
+                'INSERT OR REPLACE INTO images VALUES (?,?,?,?,?)',
+                (image_hash, model, filename, result.get('classmap'), time.time())
+            )
+            db.execute('DELETE FROM detections WHERE image_hash=? AND model=?', (image_hash, model))
+            db.executemany(
+                'INSERT INTO detections (image_hash, model, label, x0, y0, x1, y1, area) '
+                'VALUES (?,?,?,?,?,?,?,?)', rows
+            )
+        return image_hash
+
+    def count_labels(self, model:tp.Optional[str] = None) -> tp.Dict[str, int]:
+        '''Number of detections per label'''
+        query, params = 'SELECT label, COUNT(*) AS n FROM detections', ()
+        if model is not None:
+            query, params = query + ' WHERE model=?', (model,)
+        with self.lock:
+            rows = self.db.execute(query + ' GROUP BY label ORDER BY label', params).fetchall()
+        return dict((r['label'], r['n']) for r in rows)
+
+    def find_images(
+        self,
+        label:    tp.Optional[str]   = None,
+        min_area: tp.Optional[float] = None,
+        max_area: tp.Optional[float] = None,
+        model:    tp.Optional[str]   = None,
+        limit:    int = 100,
+        offset:   int = 0,
+    ) -> tp.Dict:
+        '''Images, sorted by filename, that contain at least one detection
+           matching all of the given conditions'''
+        conditions, params = [], []
+        for condition, value in [
+            ('d.label = ?', label), ('d.area >= ?', min_area), ('d.area <= ?', max_area),
+        ]:
+            if value is not None:
+                conditions += [condition]
+                params     += [value]
+        if len(conditions):
+            where = (
+                'WHERE (i.image_hash, i.model) IN (SELECT d.image_hash, d.model '
+                'FROM detections d WHERE ' + ' AND '.join(conditions) + ')'
+            )
+        else:
+            where = 'WHERE 1'
+        if model is not None:
+            where  += ' AND i.model = ?'
+            params += [model]
+
+        with self.lock:
+            total = self.db.execute(f'SELECT COUNT(*) FROM images i {where}', params).fetchone()[0]
+            rows  = self.db.execute(
+                f'SELECT i.*, (SELECT COUNT(*) FROM detections d WHERE '
+                f'd.image_hash = i.image_hash AND d.model = i.model) AS n_detections '
+                f'FROM images i {where} ORDER BY i.filename LIMIT ? OFFSET ?',
+                params + [limit, offset]
+            ).fetchall()
+        return {
+            'total'  : total,
+            'images' : [dict(r) for r in rows],
+        }
@@ -0,0 +1,100 @@
+import os, glob, time
+import typing as tp
+
+try:
+    import inotify_simple
+except ImportError:
+    #not available or not on linux, fall back to polling only
+    inotify_simple = None
+
+
+def glob_basedir(pattern:str) -> str:
+    '''The longest leading directory of a glob pattern without wildcards'''
+    parts = []
+    for part in pattern.split('/')[:-1]:
+        if glob.has_magic(part):
+            break
+        parts += [part]
+    if parts == ['']:
+        #absolute pattern directly in the filesystem root
+        return '/'
+    return '/'.join(parts) or '.'
+
+
+class FolderWatcher:
+    '''Detects new or modified files matching a glob pattern and reports them
+       once they are no longer being written to.'''
+
+    def __init__(self, pattern:str, interval:float = 1.0, settle:float = 2.0):
+        self.pattern  = pattern
+        #seconds between rescans of the folder
+        self.interval = interval
+        #seconds a file has to remain unchanged to be considered complete
+        self.settle   = settle
+        #path -> (size, mtime) of files that were already reported
+        self.seen     = dict()
+        #path -> ((size, mtime), time of last change) of files being written
+        self.pending  = dict()
+        #files that were closed after writing according to inotify
+        self.closed   = set()
+        self.inotify  = None
+
+        if inotify_simple is not None:
+            basedir = glob_basedir(pattern)
+            flags   = inotify_simple.flags
+            try:
+                self.inotify = inotify_simple.INotify()
+                self.wd_dir  = {
+                    self.inotify.add_watch(basedir, flags.CLOSE_WRITE | flags.MOVED_TO) : basedir
+                }
+            except OSError as e:
+                print(f'[WARNING] Cannot watch {basedir} ({e}), falling back to polling')
+                self.inotify = None
+
+    @staticmethod
+    def stat(path:str) -> tp.Optional[tuple]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def mark_as_seen(self, paths:tp.Iterable[str]) -> None:
+        '''Do not report these files unless they are modified'''
+        for path in paths:
+            self.seen[path] = self.stat(path)
+
+    def scan(self) -> tp.List[str]:
+        '''Files that are new or modified and complete'''
+        now   = time.time()
+        ready = []
+        for path in sorted(glob.glob(self.pattern, recursive=True)):
+            st = self.stat(path)
+            if st is None or st == self.seen.get(path):
+                continue
+
+            previous = self.pending.get(path)
+            settled  = previous and previous[0] == st and now - previous[1] >= self.settle
+            if settled or os.path.normpath(path) in self.closed:
+                ready += [path]
+                self.seen[path] = st
+                self.pending.pop(path, None)
+            elif previous is None or previous[0] != st:
+                self.pending[path] = (st, now)
+        self.closed.clear()
+        return ready
+
+    def wait(self) -> None:
+        if self.inotify is None:
+            time.sleep(self.interval)
+            return
+
+        for event in self.inotify.read(timeout=int(self.interval*1000)):
+            self.closed.add(os.path.normpath(os.path.join(self.wd_dir[event.wd], event.name)))
+
+    def __iter__(self) -> tp.Iterator[tp.List[str]]:
+        while True:
+            ready = self.scan()
+            if ready:
+                yield ready
+            self.wait()
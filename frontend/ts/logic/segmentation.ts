@@ -25,12 +25,15 @@ export class SegmentationResult extends BaseResult {
         if(super.apply(raw) == null)
             return null
         
-        if(util.is_object(raw)
-        && util.has_string_property(raw, 'classmap')) {
-            this.classmap = raw.classmap
-            return this;
+        if(util.is_object(raw) && util.has_property(raw, 'classmap')) {
+            //null if the backend did not generate a classmap (boxes-only mode)
+            const classmap:unknown = raw.classmap;
+            if(classmap === null || util.is_string(classmap)) {
+                this.classmap = classmap
+                return this;
+            }
         }
-        else return null;
+        return null;
     }
 }
 
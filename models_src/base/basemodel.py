@@ -15,7 +15,8 @@ class Model:
         self.weights = np.sort(np.random.random(4))
 
     def load_image(self, path):
-        return PIL.Image.open(path) / np.float32(255)
+        #only the shape is used, no need to convert to float
+        return np.asarray(PIL.Image.open(path))
     
     def process_image(self, image):
         '''Dummy processing function'''
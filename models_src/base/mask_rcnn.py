@@ -18,28 +18,100 @@ class MaskRCNN(torch.nn.Module):
             pretrained = True, progress = False, box_score_thresh = 0.5
         )
         self.class_list = list(map(str, range(91)))
+        self.boxes_only = False
     
     def forward(self, x):
         return self.basemodule(x)
     
-    def load_image(self, path):
-        return PIL.Image.open(path) / np.float32(255)
+    def set_inference_options(
+        self,
+        min_size:       int,
+        max_size:       int,
+        score_thresh:   float,
+        max_detections: int,
+        boxes_only:     bool,
+    ) -> None:
+        transform = self.basemodule.transform
+        transform.min_size = (min_size,)
+        transform.max_size = max_size
+        roi_heads = self.basemodule.roi_heads
+        roi_heads.score_thresh       = score_thresh
+        roi_heads.detections_per_img = max_detections
+        self.boxes_only = boxes_only
+
+    def decode_size(self, size:tp.Tuple[int,int]) -> tp.Tuple[int,int]:
+        '''Smallest (width, height) at which an image of `size` can be decoded
+           without loss, i.e. the size to which the detector would resize it'''
+        transform = self.basemodule.transform
+        min_size  = transform.min_size[-1]
+        scale     = min(min_size / min(size), transform.max_size / max(size), 1.0)
+        return (int(np.ceil(size[0]*scale)), int(np.ceil(size[1]*scale)))
+
+    @staticmethod
+    def get_image_size(path:str) -> tp.Tuple[int,int]:
+        '''Original (width, height) of an image, reads only the header'''
+        with PIL.Image.open(path) as image:
+            return image.size
+
+    def load_image(self, path:str) -> np.ndarray:
+        '''Decode an image as uint8 RGB at a reduced resolution that is still
+           at least as large as the detector input size (see decode_size())'''
+        image   = PIL.Image.open(path)
+        target  = self.decode_size(image.size)
+        #JPEG only: decode directly at 1/2, 1/4 or 1/8 scale, still >= target
+        image.draft('RGB', target)
+        #other formats: fast integer downscaling before any conversion
+        factor  = min(image.size[0] // target[0], image.size[1] // target[1])
+        if factor > 1:
+            if image.mode not in ['L', 'RGB', 'RGBA', 'I', 'F']:
+                image = image.convert('RGB')
+            image = image.reduce(factor)
+        image   = image.convert('RGB')
+        #one copy out of PIL into a writable array
+        return np.array(image)
+
+    @staticmethod
+    def to_tensor(x:np.ndarray) -> torch.Tensor:
+        if x.dtype == np.uint8:
+            #torch.from_numpy() shares memory, float conversion as late as possible
+            return torch.from_numpy(x).permute(2,0,1).to(torch.float32).div_(255)
+        return torchvision.transforms.ToTensor()(x)
 
     def process_image(self, x:str) -> tp.Dict:
+        og_size = None
         if isinstance(x, str):
-            x = self.load_image(x)
+            og_size = self.get_image_size(x)
+            x       = self.load_image(x)
         if not torch.is_tensor(x):
-            x = torchvision.transforms.ToTensor()(x)
+            x = self.to_tensor(x)
 
+        boxes_only = getattr(self, 'boxes_only', False)
+        roi_heads  = self.basemodule.roi_heads
+        mask_pool  = roi_heads.mask_roi_pool
         self.eval()
-        with torch.no_grad():
-            y = self(x[None])
+        try:
+            if boxes_only:
+                #roi_heads skips the mask branch if this is not set
+                roi_heads.mask_roi_pool = None
+            with torch.no_grad():
+                y = self(x[None])
+        finally:
+            roi_heads.mask_roi_pool = mask_pool
         
-        classmap = y[0]['masks'][:,0].cpu().numpy()
-        classmap = np.pad(classmap, [(1,0), (0,0), (0,0)]).max(0)
-        classmap = ( (classmap>0.5) *255).astype('uint8')
+        classmap = None
+        if not boxes_only:
+            classmap = y[0]['masks'][:,0].cpu().numpy()
+            classmap = np.pad(classmap, [(1,0), (0,0), (0,0)]).max(0)
+            classmap = ( (classmap>0.5) *255).astype('uint8')
         boxes    = y[0]['boxes'].cpu().numpy()
         labels   = y[0]['labels'].cpu().numpy()
+
+        if og_size is not None and og_size != (x.shape[2], x.shape[1]):
+            #map back to original image coordinates
+            boxes    = boxes * ([og_size[0] / x.shape[2], og_size[1] / x.shape[1]] * 2)
+            if classmap is not None:
+                classmap = PIL.Image.fromarray(classmap).resize(og_size, PIL.Image.NEAREST)
+                classmap = np.asarray(classmap)
         return {
             'classmap'  :   classmap,
             'boxes'     :   boxes,
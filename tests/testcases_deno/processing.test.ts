@@ -29,6 +29,18 @@ Deno.test('segmentationprocessing', async (t:Deno.TestContext) => {
     })
     mock.restore()
 
+    await t.step('process:no-classmap', async () => {
+        util.mock_fetch( async () => await new Response(JSON.stringify({
+            classmap: null,
+        })) );
+
+        const result:segmentation.SegmentationResult 
+            = await sfp.process( mockfile )
+        asserts.assertNotEquals(result.status, 'failed')
+        asserts.assertEquals(result.classmap, null)
+    })
+    mock.restore()
+
     await t.step('upload-fail', async () => {
         // fetch that throws an error
         util.mock_fetch_connection_error('Should be caught')